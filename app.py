@@ -1,18 +1,64 @@
 import os
+import re
 import sys
+import time
+import uuid
+import base64
 import shutil
+import hashlib
 import zipfile
+import tempfile
+import threading
 import requests
 import importlib.util
-from flask import Flask, request, render_template_string, jsonify, redirect
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, request, jsonify, redirect
+from functools import lru_cache
+from jinja2 import Template
 from packaging import version
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 PACKAGE = "math_module"
 LOCAL_STORE = "packages"
 BUCKET = "kraft-packages"
 
+# Memoized so the same version strings aren't re-parsed on every sort
+# comparison of every poll cycle
+parse_version = lru_cache(maxsize=256)(version.parse)
+
+# One pooled session so every GCS call reuses the same TCP+TLS connection
+# instead of paying the handshake on each poll
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.3)
+))
+
 app = Flask(__name__)
 
+# Static assets are referenced with ?v=<content hash>, so they can be
+# cached for a year and still bust the cache whenever the files change
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 31536000
+
+
+def _asset_hash():
+    h = hashlib.md5()
+    for name in ("app.css", "app.js"):
+        with open(os.path.join(app.static_folder, name), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+ASSET_HASH = _asset_hash()
+
 
 # -----------------------------------------------------
 # FORCE RELOAD
@@ -29,7 +75,16 @@ def force_reload():
 # -----------------------------------------------------
 # LOAD MODULE
 # -----------------------------------------------------
+# Re-importing the package from disk on every arithmetic POST is pure
+# overhead; keep the loaded module around until the version changes
+_mod_cache = {"ver": None, "mod": None}
+
+
 def load_module(ver):
+    # Already loaded at this version -- skip the purge/re-exec entirely
+    if _mod_cache["ver"] == ver and _mod_cache["mod"] is not None:
+        return _mod_cache["mod"]
+
     force_reload()
 
     pkg_root = f"{LOCAL_STORE}/{PACKAGE}/{ver}/{PACKAGE}"
@@ -40,156 +95,346 @@ def load_module(ver):
     spec = importlib.util.spec_from_file_location(PACKAGE, module_path)
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
+
+    _mod_cache["ver"] = ver
+    _mod_cache["mod"] = module
     return module
 
 
+def invalidate_module_cache():
+    _mod_cache["ver"] = None
+    _mod_cache["mod"] = None
+
+
 # -----------------------------------------------------
 # LIST ONLINE VERSIONS
 # -----------------------------------------------------
 def list_versions_online():
     try:
-        url = f"https://storage.googleapis.com/storage/v1/b/{BUCKET}/o?prefix={PACKAGE}/&delimiter=/"
-        r = requests.get(url).json()
+        # fields=prefixes strips the listing down to the only key we read
+        url = f"https://storage.googleapis.com/storage/v1/b/{BUCKET}/o?prefix={PACKAGE}/&delimiter=/&fields=prefixes"
+        resp = SESSION.get(url, timeout=(3, 30))
+        r = orjson.loads(resp.content) if orjson else resp.json()
 
         versions = []
         for prefix in r.get("prefixes", []):
             versions.append(prefix.split("/")[1])
 
-        return sorted(versions, key=version.parse)
+        return sorted(versions, key=parse_version)
 
     except:
         return []
 
 
+# Version lists change on the order of minutes/hours, so a short TTL
+# absorbs the polling without going back to GCS each time. Seeded with
+# -inf because time.monotonic() counts from boot: a ts of 0 would look
+# fresh on a server started within ttl seconds of boot
+_versions_cache = {"ts": float("-inf"), "data": []}
+
+
+def list_versions_online_cached(ttl=30):
+    now = time.monotonic()
+    if now - _versions_cache["ts"] > ttl:
+        _versions_cache["data"] = list_versions_online()
+        _versions_cache["ts"] = now
+    return _versions_cache["data"]
+
+
 # -----------------------------------------------------
-# INSTALLED VERSION
+# INSTALLED VERSIONS SCAN
 # -----------------------------------------------------
-def get_installed_version():
+# The package dir only changes on update/rollback, so key the scan on the
+# directory mtime and skip the listdir + parse + sort when it's unchanged
+_dir_cache = {"mtime": -1, "versions": []}
+
+
+def _scan_versions():
     base = f"{LOCAL_STORE}/{PACKAGE}"
-    if not os.path.exists(base): return None
 
-    versions = []
-    for d in os.listdir(base):
-        if os.path.isdir(os.path.join(base, d)):
-            try:
-                version.parse(d)
-                versions.append(d)
-            except:
-                pass
+    try:
+        mtime = os.stat(base).st_mtime_ns
+    except OSError:
+        return []
+
+    if mtime != _dir_cache["mtime"]:
+        versions = []
+        with os.scandir(base) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    try:
+                        parse_version(entry.name)
+                        versions.append(entry.name)
+                    except:
+                        pass
+
+        _dir_cache["versions"] = sorted(versions, key=parse_version)
+        _dir_cache["mtime"] = mtime
 
-    return sorted(versions, key=version.parse)[-1] if versions else None
+    return _dir_cache["versions"]
+
+
+# -----------------------------------------------------
+# INSTALLED VERSION
+# -----------------------------------------------------
+def get_installed_version():
+    versions = _scan_versions()
+    return versions[-1] if versions else None
 
 
 # -----------------------------------------------------
 # PREVIOUS VERSION
 # -----------------------------------------------------
 def get_previous_version():
-    base = f"{LOCAL_STORE}/{PACKAGE}"
-    if not os.path.exists(base): return None
-
-    versions = []
-    for d in os.listdir(base):
-        if os.path.isdir(os.path.join(base, d)):
-            try:
-                version.parse(d)
-                versions.append(d)
-            except:
-                pass
-
-    versions = sorted(versions, key=version.parse)
+    versions = _scan_versions()
     return versions[-2] if len(versions) >= 2 else None
 
 
+def get_installed_and_previous():
+    versions = _scan_versions()
+    installed = versions[-1] if versions else None
+    previous = versions[-2] if len(versions) >= 2 else None
+    return installed, previous
+
+
 # -----------------------------------------------------
-# DOWNLOAD ZIP
+# DOWNLOAD + EXTRACT ZIP
 # -----------------------------------------------------
-def download_zip(ver):
+def download_and_extract(ver, extract_dir=None):
     url = f"https://storage.googleapis.com/{BUCKET}/{PACKAGE}/{ver}/{PACKAGE}-{ver}.zip"
 
-    local_zip = f"{LOCAL_STORE}/{PACKAGE}/{ver}.zip"
-    os.makedirs(os.path.dirname(local_zip), exist_ok=True)
+    if extract_dir is None:
+        extract_dir = f"{LOCAL_STORE}/{PACKAGE}/{ver}"
+    os.makedirs(os.path.dirname(extract_dir), exist_ok=True)
+
+    # Spool the archive through memory (spilling to a temp file past 64 MB)
+    # and extract straight from it -- no staging .zip on disk
+    buf = tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024)
+
+    # Hash the bytes as they stream in so verification costs no extra read
+    h = hashlib.md5()
+    with SESSION.get(url, stream=True, timeout=(3, 30)) as r:
+        r.raise_for_status()
+        for chunk in r.iter_content(chunk_size=1024 * 1024):
+            h.update(chunk)
+            buf.write(chunk)
+        _verify_gcs_md5(h, r.headers.get("x-goog-hash", ""))
+
+    if os.path.exists(extract_dir):
+        shutil.rmtree(extract_dir)
+
+    buf.seek(0)
+    with zipfile.ZipFile(buf) as z:
+        # zlib inflate runs in C and releases the GIL, so independent
+        # members really do decompress and write in parallel
+        with ThreadPoolExecutor(max_workers=4) as ex:
+            list(ex.map(
+                lambda info: _extract_member(z, info, extract_dir),
+                z.infolist()
+            ))
 
-    data = requests.get(url).content
+    return extract_dir
 
-    with open(local_zip, "wb") as f:
-        f.write(data)
 
-    return local_zip
+def _verify_gcs_md5(h, goog_hash):
+    # GCS sends "x-goog-hash: crc32c=...,md5=..." with base64 digests
+    if "md5=" not in goog_hash:
+        return
+    expected = base64.b64decode(goog_hash.split("md5=")[1])
+    if h.digest() != expected:
+        raise IOError("zip download corrupted: md5 mismatch")
 
 
 # -----------------------------------------------------
-# EXTRACT ZIP
+# BACKGROUND PREFETCH
 # -----------------------------------------------------
-def extract_zip(zip_path, ver):
-    extract_dir = f"{LOCAL_STORE}/{PACKAGE}/{ver}"
+# Once /check_update spots a newer version an update click is likely, so
+# fetch it speculatively and the POST only has to load the module.
+# Prefetches land in a .prefetch staging dir -- invisible to
+# _scan_versions since the name doesn't parse as a version -- and are
+# renamed into place only when the user actually clicks Update
+_prefetch_jobs = {}
+_prefetch_lock = threading.Lock()
 
-    if os.path.exists(extract_dir):
-        shutil.rmtree(extract_dir)
 
-    with zipfile.ZipFile(zip_path, "r") as z:
-        z.extractall(extract_dir)
+def _staging_dir(ver):
+    return f"{LOCAL_STORE}/{PACKAGE}/{ver}.prefetch"
 
-    return extract_dir
+
+def prefetch_version(ver):
+    with _prefetch_lock:
+        if ver in _prefetch_jobs:
+            return
+        t = threading.Thread(target=_prefetch_worker, args=(ver,), daemon=True)
+        _prefetch_jobs[ver] = t
+    t.start()
+
+
+def _prefetch_worker(ver):
+    try:
+        download_and_extract(ver, extract_dir=_staging_dir(ver))
+    except Exception as e:
+        print("PREFETCH ERROR:", e)
+        with _prefetch_lock:
+            _prefetch_jobs.pop(ver, None)
+
+
+def wait_for_prefetch(ver):
+    t = _prefetch_jobs.get(ver)
+    if t is None:
+        return False
+    t.join()
+
+    staging = _staging_dir(ver)
+    if not os.path.isdir(staging):
+        return False
+
+    # Activate the staged copy; only now does the version scan see it
+    target = f"{LOCAL_STORE}/{PACKAGE}/{ver}"
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.rename(staging, target)
+
+    with _prefetch_lock:
+        _prefetch_jobs.pop(ver, None)
+    return True
+
+
+def _extract_member(z, info, extract_dir):
+    name = info.filename
+    if name.startswith("/") or ".." in name.split("/"):
+        return
+
+    target = os.path.join(extract_dir, name)
+
+    if name.endswith("/"):
+        os.makedirs(target, exist_ok=True)
+        return
+
+    os.makedirs(os.path.dirname(target) or extract_dir, exist_ok=True)
+
+    # 1 MB copy buffer; ZipFile.extract copies in 64 KB chunks, which is
+    # syscall-heavy for archives with many small members
+    with z.open(info) as src, open(target, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+# -----------------------------------------------------
+# ASYNC DELETE
+# -----------------------------------------------------
+def remove_tree_async(path):
+    # Rename is one syscall, so the request returns immediately and the
+    # per-file unlinking happens off the request thread
+    trash = f"{path}.trash.{uuid.uuid4().hex}"
+    os.rename(path, trash)
+    threading.Thread(
+        target=shutil.rmtree, args=(trash,),
+        kwargs={"ignore_errors": True}, daemon=True
+    ).start()
 
 
 # -----------------------------------------------------
 # SERVE README
 # -----------------------------------------------------
-@app.route("/readme/<ver>")
-def readme(ver):
+# One pass over the text instead of a chained .replace per escape, which
+# copied the whole README three times
+_README_SUBS = re.compile(r"\\u2714|\\r\\n|\\n")
+_README_MAP = {"\\u2714": "✔", "\\r\\n": "\n", "\\n": "\n"}
+
+
+# Memoized: the README for a given version never changes once published,
+# so after warmup this stops hitting GCS entirely. Anything but a 200
+# raises, and lru_cache doesn't cache exceptions, so a 404/503/timeout
+# is retried on the next request instead of being remembered forever.
+@lru_cache(maxsize=32)
+def _fetch_readme(ver):
 
     # Correct GCS path for separate README upload
     url = f"https://storage.googleapis.com/{BUCKET}/{PACKAGE}/{ver}/README.md"
 
-    r = requests.get(url)
+    with SESSION.get(url, stream=True, timeout=(3, 30)) as r:
+        r.raise_for_status()
 
-    if r.status_code != 200:
-        return "README not found.", 404
+        raw = bytearray()
+        for chunk in r.iter_content(chunk_size=64 * 1024):
+            raw += chunk
 
-    text = (
-        r.text.replace("\\u2714", "✔")
-              .replace("\\r\\n", "\n")
-              .replace("\\n", "\n")
+    return _README_SUBS.sub(
+        lambda m: _README_MAP[m.group(0)],
+        raw.decode("utf-8", errors="replace")
     )
 
-    return text
+
+@app.route("/readme/<ver>")
+def readme(ver):
+    try:
+        text = _fetch_readme(ver)
+    except requests.RequestException:
+        return "README not found.", 404
+
+    resp = app.make_response(text)
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp
 
 
 
 # -----------------------------------------------------
 # UPDATE CHECK (CRITICAL FIXED VERSION)
 # -----------------------------------------------------
+def _json_response(payload):
+    # orjson serializes in C, a few times faster than jsonify's stdlib
+    # json -- worth it on a handler hit by every poll
+    if orjson:
+        return app.response_class(orjson.dumps(payload), mimetype="application/json")
+    return jsonify(payload)
+
+
 @app.route("/check_update")
 def check_update():
     try:
-        installed = get_installed_version()
-        online = list_versions_online()
+        installed, previous = get_installed_and_previous()
+        online = list_versions_online_cached()
 
         if not online:
-            return jsonify({
+            payload = {
                 "installed": installed,
                 "latest": None,
                 "previous": None,
                 "update_available": False,
                 "rollback_available": False
-            })
-
-        latest = online[-1]
-        previous = get_previous_version()
-
-        return jsonify({
-            "installed": installed,
-            "latest": latest,
-            "previous": previous,
-            "update_available": (
-                installed is None or version.parse(latest) > version.parse(installed)
-            ),
-            "rollback_available": previous is not None
-        })
+            }
+        else:
+            latest = online[-1]
+            payload = {
+                "installed": installed,
+                "latest": latest,
+                "previous": previous,
+                "update_available": (
+                    installed is None or parse_version(latest) > parse_version(installed)
+                ),
+                "rollback_available": previous is not None
+            }
+
+        # The payload only changes on update/rollback/release, so let the
+        # browser revalidate with a free 304 instead of a full response
+        etag = hashlib.md5(
+            f"{payload['installed']}|{payload['latest']}|{payload['previous']}".encode()
+        ).hexdigest()
+
+        if payload["update_available"] and payload["latest"]:
+            prefetch_version(payload["latest"])
+
+        if request.headers.get("If-None-Match") == etag:
+            return "", 304
+
+        resp = _json_response(payload)
+        resp.headers["ETag"] = etag
+        resp.headers["Cache-Control"] = "max-age=5, must-revalidate"
+        return resp
 
     except Exception as e:
         print("ERROR:", e)
-        return jsonify({
+        return _json_response({
             "installed": None,
             "latest": None,
             "previous": None,
@@ -199,100 +444,10 @@ def check_update():
 
 
 # -----------------------------------------------------
-# MAIN PAGE
+# MAIN PAGE TEMPLATE
 # -----------------------------------------------------
-@app.route("/", methods=["GET", "POST"])
-def index():
-    result = sub_result = mul_result = None
-    a_val = b_val = ""  # store input values
-
-    if request.method == "POST":
-        a_val = request.form.get("a", "")
-        b_val = request.form.get("b", "")
-
-        installed = get_installed_version()
-        mod = load_module(installed)
-
-        if "add" in request.form:
-            result = mod.add(float(a_val), float(b_val))
-
-        if "subtract" in request.form:
-            sub_result = mod.subtract(float(a_val), float(b_val))
-
-        if "multiply" in request.form:
-            mul_result = mod.multiply(float(a_val), float(b_val))
-
-        if "update" in request.form:
-            latest = list_versions_online()[-1]
-            zip_path = download_zip(latest)
-            extract_zip(zip_path, latest)
-            load_module(latest)
-            return redirect("/")
-
-        if "rollback" in request.form:
-            installed = get_installed_version()
-            previous = get_previous_version()
-
-            if previous:
-                shutil.rmtree(f"{LOCAL_STORE}/{PACKAGE}/{installed}")
-                load_module(previous)
-
-            return redirect("/")
-
-    # -----------------------------------------------------
-    # HTML TEMPLATE (SAFE & TESTED)
-    # -----------------------------------------------------
-    html = """
-    <style>
-    /* Mobile layout up to 600px */
-    @media (max-width: 600px) {
-
-        /* Header resizing */
-        h1 {
-            font-size: 28px !important;
-        }
-
-        /* Update box full width */
-        #update-box {
-            width: 100% !important;
-        }
-
-        /* Stack form inputs vertically */
-        form {
-            flex-direction: column !important;
-            align-items: stretch !important;
-        }
-
-        form input {
-            width: 100% !important;
-        }
-
-        form button {
-            width: 100% !important;
-            margin-top: 8px !important;
-        }
-
-        /* Modal width on mobile */
-        #readmeModal > div {
-            max-width: 90% !important;
-        }
-    }
-
-    /* Tablet responsiveness */
-    @media (min-width: 601px) and (max-width: 900px) {
-        #update-box {
-            width: 70% !important;
-        }
-
-        form input {
-            width: 45% !important;
-        }
-
-        #readmeModal > div {
-            max-width: 75% !important;
-        }
-    }
-</style>
+_INDEX_HTML = """
+    <link rel="stylesheet" href="/static/app.css?v={{asset_hash}}">
 <body style="background:#f4f6fc; margin:0; padding:0;">
 <div style="padding-left:30px; padding-right:30px;">
 
@@ -451,105 +606,65 @@ def index():
     </div>
 
 
-    <script>
-    async function poll() {
-        try {
-            const r = await fetch("/check_update");
-            const d = await r.json();
-
-            const box = document.getElementById("update-box");
-
-            if (d.update_available) {
-                box.innerHTML = `
-                <div style="font-family: Arial; font-size: 16px; color: #22225c;">
-                    <strong>Installed:</strong> ${d.installed}<br>
-                    <strong>Latest:</strong> ${d.latest}<br><br>
-                    
-
-                    <form method="POST">
-                        <button name="update" style="
-                            padding: 8px 15px;
-                            background: #4b5bd1;
-                            color: white;
-                            border: none;
-                            border-radius: 6px;
-                            font-size: 14px;
-                            cursor: pointer;
-                            box-shadow: 0 1px 4px rgba(0,0,0,0.2);
-                            margin-bottom: 10px;
-                        ">
-                        Update to ${d.latest}
-                        </button>
-                    </form>
-
-                    <button onclick="openReadme('${d.latest}')" style="
-                        padding: 8px 15px;
-                        background: #444;
-                        color: white;
-                        border: none;
-                        border-radius: 6px;
-                        font-size: 14px;
-                        cursor: pointer;
-                        box-shadow: 0 1px 4px rgba(0,0,0,0.2);
-                    ">View README</button>
-                    </div>
-                `;
-            }
-            else {
-                box.innerHTML = `
-                    <div style="font-family: Arial; font-size: 16px;">
-                    <strong>Installed:</strong> ${d.installed}<br>
-                    <strong>Latest:</strong> ${d.latest}<br>
-                </div>
-                `;
-
-                if (d.rollback_available) {
-                    box.innerHTML += `
-                        <br>
-                        <form method="POST">
-                        <button name="rollback"
-                        style="
-                            padding: 8px 15px;
-                            background: #d9534f;
-                            color: white;
-                            border: none;
-                            border-radius: 6px;
-                            font-size: 14px;
-                            cursor: pointer;
-                            box-shadow: 0 1px 4px rgba(0,0,0,0.2);
-                        ">
-                        Rollback to ${d.previous}
-                        </button>
-                        </form>
-                    `;
-                }
-            }
-
-        } catch (e) {
-            console.log("Poll error:", e);
-        }
-    }
-
-    poll();
-    setInterval(poll, 3000);
-
-    async function openReadme(ver) {
-        const r = await fetch("/readme/" + ver);
-        const t = await r.text();
-        document.getElementById("readmeContent").textContent = t;
-        document.getElementById("readmeModal").style.display = "block";
-    }
-
-    function closeReadme() {
-        document.getElementById("readmeModal").style.display = "none";
-    }
-    </script>
+    <script src="/static/app.js?v={{asset_hash}}"></script>
     </div>
     </body>
-    """
+"""
+
+# Compiled once at import so per-request renders skip the lex/parse step;
+# autoescape matches render_template_string, which escaped the echoed
+# form values for us
+_INDEX_TMPL = Template(_INDEX_HTML, autoescape=True)
+
+
+# -----------------------------------------------------
+# MAIN PAGE
+# -----------------------------------------------------
+@app.route("/", methods=["GET", "POST"])
+def index():
+    result = sub_result = mul_result = None
+    a_val = b_val = ""  # store input values
+
+    if request.method == "POST":
+        a_val = request.form.get("a", "")
+        b_val = request.form.get("b", "")
+
+        installed = get_installed_version()
+        mod = load_module(installed)
+
+        if "add" in request.form:
+            result = mod.add(float(a_val), float(b_val))
+
+        if "subtract" in request.form:
+            sub_result = mod.subtract(float(a_val), float(b_val))
+
+        if "multiply" in request.form:
+            mul_result = mod.multiply(float(a_val), float(b_val))
+
+        if "update" in request.form:
+            latest = list_versions_online()[-1]
+            if not wait_for_prefetch(latest):
+                download_and_extract(latest)
+            invalidate_module_cache()
+            load_module(latest)
+            return redirect("/")
+
+        if "rollback" in request.form:
+            installed, previous = get_installed_and_previous()
+
+            if previous:
+                remove_tree_async(f"{LOCAL_STORE}/{PACKAGE}/{installed}")
+                invalidate_module_cache()
+                load_module(previous)
+
+            return redirect("/")
+
+    # -----------------------------------------------------
+    # HTML TEMPLATE (SAFE & TESTED)
+    # -----------------------------------------------------
 
-    return render_template_string(
-        html,
+    return _INDEX_TMPL.render(
+        asset_hash=ASSET_HASH,
         result=result,
         sub_result=sub_result,
         mul_result=mul_result,
@@ -559,4 +674,7 @@ def index():
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Local development only. In production run under Gunicorn so polls
+    # don't queue behind a single-threaded dev server:
+    #   gunicorn -w 4 -k gthread --threads 8 app:app
+    app.run(threaded=True)
@@ -0,0 +1,101 @@
+async function poll() {
+    try {
+        const r = await fetch("/check_update");
+        const d = await r.json();
+
+        const box = document.getElementById("update-box");
+
+        if (d.update_available) {
+            box.innerHTML = `
+            <div style="font-family: Arial; font-size: 16px; color: #22225c;">
+                <strong>Installed:</strong> ${d.installed}<br>
+                <strong>Latest:</strong> ${d.latest}<br><br>
+                
+
+                <form method="POST">
+                    <button name="update" style="
+                        padding: 8px 15px;
+                        background: #4b5bd1;
+                        color: white;
+                        border: none;
+                        border-radius: 6px;
+                        font-size: 14px;
+                        cursor: pointer;
+                        box-shadow: 0 1px 4px rgba(0,0,0,0.2);
+                        margin-bottom: 10px;
+                    ">
+                    Update to ${d.latest}
+                    </button>
+                </form>
+
+                <button onclick="openReadme('${d.latest}')" style="
+                    padding: 8px 15px;
+                    background: #444;
+                    color: white;
+                    border: none;
+                    border-radius: 6px;
+                    font-size: 14px;
+                    cursor: pointer;
+                    box-shadow: 0 1px 4px rgba(0,0,0,0.2);
+                ">View README</button>
+                </div>
+            `;
+        }
+        else {
+            box.innerHTML = `
+                <div style="font-family: Arial; font-size: 16px;">
+                <strong>Installed:</strong> ${d.installed}<br>
+                <strong>Latest:</strong> ${d.latest}<br>
+            </div>
+            `;
+
+            if (d.rollback_available) {
+                box.innerHTML += `
+                    <br>
+                    <form method="POST">
+                    <button name="rollback"
+                    style="
+                        padding: 8px 15px;
+                        background: #d9534f;
+                        color: white;
+                        border: none;
+                        border-radius: 6px;
+                        font-size: 14px;
+                        cursor: pointer;
+                        box-shadow: 0 1px 4px rgba(0,0,0,0.2);
+                    ">
+                    Rollback to ${d.previous}
+                    </button>
+                    </form>
+                `;
+            }
+        }
+
+    } catch (e) {
+        console.log("Poll error:", e);
+    }
+}
+
+const POLL_MS = 15000;
+poll();
+let pollTimer = setInterval(poll, POLL_MS);
+
+// Don't keep polling from backgrounded tabs
+document.addEventListener("visibilitychange", () => {
+    clearInterval(pollTimer);
+    if (!document.hidden) {
+        poll();
+        pollTimer = setInterval(poll, POLL_MS);
+    }
+});
+
+async function openReadme(ver) {
+    const r = await fetch("/readme/" + ver);
+    const t = await r.text();
+    document.getElementById("readmeContent").textContent = t;
+    document.getElementById("readmeModal").style.display = "block";
+}
+
+function closeReadme() {
+    document.getElementById("readmeModal").style.display = "none";
+}